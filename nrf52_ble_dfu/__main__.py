@@ -1,7 +1,8 @@
-import os
-import asyncio
 import argparse
+import atexit
 import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
 from pathlib import Path
 from enum import Enum
 
@@ -15,13 +16,24 @@ class DFUMode(str, Enum):
 
 def get_log_name(path: Path=None):
     assert isinstance(path, Path)
-    base_path = path
-    idx = 0
-    path = path.with_stem(f"{base_path.stem}-{idx}")
-    while path.exists():
-        idx += 1
-        path = path.with_stem(f"{base_path.stem}-{idx}")
-    return path
+    # list the directory once and take the next index after the highest
+    # existing log, instead of stat()ing every candidate name in turn
+    prefix = f"{path.stem}-"
+    idx = -1
+    for existing in path.parent.glob(f"{prefix}*{path.suffix}"):
+        existing_idx = existing.stem[len(prefix):]
+        if existing_idx.isdigit():
+            idx = max(idx, int(existing_idx))
+    return path.with_stem(f"{prefix}{idx + 1}")
+
+def prn_window(value: str) -> int:
+    # the protocol code is only imported if a prn is actually given
+    from .protocol.secure import check_prn_window
+    prn = int(value)
+    try:
+        return check_prn_window(prn)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
 
 parser = argparse.ArgumentParser()
 parser.add_argument("pkg_path", type=Path,
@@ -34,6 +46,10 @@ parser.add_argument("--log", type=Path, default=Path("dfu.log"),
     help="path to log file")
 parser.add_argument("-v", dest='debug', action='store_true', default=False,
     help="show debug output")
+parser.add_argument("--timeout", type=float, default=10.0,
+    help="seconds to wait for each response from the target (default: 10)")
+parser.add_argument("--prn", type=prn_window, default=0,
+    help="packets sent between receipt notifications, 0 to only check each object once sent (default: 0)")
 parser.add_argument("--print-init", nargs='+', type=str, default=[],
     help="print the init packet contents of specified firmware types (bootloader, softdevice, application)")
 
@@ -45,8 +61,13 @@ file_handler = logging.FileHandler(str(get_log_name(args.log)))
 file_handler.setFormatter(log_fmt)
 stream_handler = logging.StreamHandler()
 stream_handler.setFormatter(log_fmt)
-log.addHandler(file_handler)
-log.addHandler(stream_handler)
+# write records from a background thread so file/console i/o
+# doesn't stall the event loop during a transfer
+log_queue = SimpleQueue()
+log_listener = QueueListener(log_queue, file_handler, stream_handler)
+log.addHandler(QueueHandler(log_queue))
+log_listener.start()
+atexit.register(log_listener.stop)
 lvl = logging.DEBUG if args.debug else logging.INFO
 log.setLevel(lvl)
 
@@ -67,10 +88,18 @@ assert args.mode == DFUMode.SECURE, \
 
 log.info(f"starting dfu with pkg {str(args.pkg_path)}")
 
+# asyncio, bleak and the protocol code are only needed to run an update,
+# so keep them out of the --print-init path
 from .protocol.secure import SecureDFUManager
 
+try:
+    # uvloop's event loop has less overhead per await and callback
+    from uvloop import run as run_loop
+except ImportError:
+    from asyncio import run as run_loop
+
 pkg = DFUPackage(args.pkg_path)
 
-dfu_mgr = SecureDFUManager(args.target, pkg, log=log)
+dfu_mgr = SecureDFUManager(args.target, pkg, log=log, timeout=args.timeout, prn_window=args.prn)
 
-asyncio.run(dfu_mgr.run())
\ No newline at end of file
+run_loop(dfu_mgr.run())
\ No newline at end of file
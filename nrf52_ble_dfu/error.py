@@ -1,21 +1,56 @@
-from collections import namedtuple
-from enum import Enum
+from enum import IntEnum
 
 # the following error enums are based on Nordic's iOS DFU library
 # https://github.com/NordicSemiconductor/IOS-DFU-Library
 
+# success codes for each of the remote dfu services
+_OK_CODES = frozenset((1, 11, 91, 9001))
+
 class DFUError(Exception):
     """An error occured during device firmware update"""
     def __init__(self, code: int, message: str, *args):
-        self.message = message
-        self.code = code
         super().__init__(code, message, *args)
 
+    # code and message are kept in args rather than duplicated on the instance
+    @property
+    def code(self) -> int:
+        return self.args[0]
+
+    @property
+    def message(self) -> str:
+        return self.args[1]
+
+    def ok(self):
+        return self.code in _OK_CODES
+
+
+class _DFUCodeEnum(IntEnum):
+    """base for error code tables
+
+    members are plain ints so that looking up codes is cheap, and a
+    DFUError is only constructed when one actually needs to be raised
+    """
+    def __new__(cls, code: int, message: str):
+        member = int.__new__(cls, code)
+        member._value_ = code
+        member.message = message
+        return member
+
+    @property
+    def code(self) -> int:
+        return self.value
+
+    def as_err(self, detail: str = None) -> DFUError:
+        """the error to raise for this code, optionally with extra detail"""
+        if detail is None:
+            return DFUError(self.value, self.message)
+        return DFUError(self.value, f"{self.message}: {detail}")
+
     def ok(self):
-        return self.code in [1, 11, 91, 9001]
+        return self.value in _OK_CODES
 
 
-class DFURemoteErrorCode(DFUError, Enum):
+class DFURemoteErrorCode(_DFUCodeEnum):
     """Offsets for types of remote dfu error codes"""
     
     LEGACY                  = (0,    "A remote error returned from Legacy DFU bootloader")
@@ -24,10 +59,7 @@ class DFURemoteErrorCode(DFUError, Enum):
     BUTTONLESS              = (90,   "A remote error returned from Buttonless service")
     EXPERIMENTAL_BUTTONLESS = (9000, "A remote error returned from the experimental Buttonless service from SDK 12")
 
-    def as_err(self):
-        return self.value
-
-class DFUErrorCode(DFUError, Enum):
+class DFUErrorCode(_DFUCodeEnum):
     """DFU error codes and descriptions"""
 
     # legacy errors
@@ -51,13 +83,13 @@ class DFUErrorCode(DFUError, Enum):
     REMOTE_SECURE_DFU_EXTENDED_ERROR            = (21,   "Secure DFU bootloader reported a detailed error")
 
     # detailed extended errors
-    # REMOTE_EXTENDED_ERROR_WRONG_COMMAND_FORMAT  = DFUError(22,   "Format of the command was incorrect") # unused
+    REMOTE_EXTENDED_ERROR_WRONG_COMMAND_FORMAT  = (22,   "Format of the command was incorrect")
     REMOTE_EXTENDED_ERROR_UNKNOWN_COMMAND       = (23,   "Command successfully parsed, but not supported or unknown")
     REMOTE_EXTENDED_ERROR_INIT_COMMAND_INVALID  = (24,   "Init command has invalid update type or missing requred fields")
     REMOTE_EXTENDED_ERROR_FW_VERSION_FAILURE    = (25,   "Firmware version is older than current version, cannot downgrade")
     REMOTE_EXTENDED_ERROR_HW_VERSION_FAILURE    = (26,   "Hardware version of device does not match required version for update")
-    REMOTE_EXTENDED_ERROR_SD_VERSION_FAILIRE    = (27,   "Current SoftDevice FWID does not support the update, or first FWID is '0' on bootloader that requires SoftDevice")
-    # REMOTE_EXTENDED_ERROR_SIGNATURE_MISSING     = DFUError(28,   "Init packet does not contain a signature") # unused
+    REMOTE_EXTENDED_ERROR_SD_VERSION_FAILURE    = (27,   "Current SoftDevice FWID does not support the update, or first FWID is '0' on bootloader that requires SoftDevice")
+    REMOTE_EXTENDED_ERROR_SIGNATURE_MISSING     = (28,   "Init packet does not contain a signature")
     REMOTE_EXTENDED_ERROR_WRONG_HASH_TYPE       = (29,   "Hash type specified by init packet is not supported by the DFU bootloader")
     REMOTE_EXTENDED_ERROR_HASH_FAILED           = (30,   "Firmware image hash cannot be calculated")
     REMOTE_EXTENDED_ERROR_WRONG_SIGNATURE_TYPE  = (31,   "Signature type is unknown or not supported by the DFU bootloader")
@@ -98,11 +130,11 @@ class DFUErrorCode(DFUError, Enum):
     CRC_ERROR                           = (309,  "CRC reported by remote device does not match after 3 attempts to send data")
     INVALID_INTERNAL_STATE              = (500,  "Service went into an invalid state. Attempt to close without crashing. Returning to known state impossible")
 
-    def as_err(self):
-        return self.value
-
     def is_remote(self):
         """true if error was caused by remote device or occurred locally"""
-        return self.value.code < 100 or self.value.code > 9000
-
+        return self._is_remote
 
+# the codes are fixed, so work out which are remote once at import
+for _member in DFUErrorCode:
+    _member._is_remote = _member.value < 100 or _member.value > 9000
+del _member
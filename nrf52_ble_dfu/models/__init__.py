@@ -32,6 +32,23 @@ class TxStateHandler(ABC):
     def exit(cls, context) -> TxStatus:
         return TxStatus.IGNORED
 
+    @classmethod
+    async def run(cls, context) -> TxStatus:
+        """run the state from entry until it transitions away or completes
+
+        the handler is called again for as long as it keeps handling, so the
+        manager only has to step in when the state changes
+        """
+        status = await cls.entry(context)
+        while status in _CONTINUE:
+            status = await cls.handle(context)
+        if status == TxStatus.TRANSITIONED:
+            cls.exit(context)
+        return status
+
+# handler results that leave the state machine in the same state
+_CONTINUE = frozenset((TxStatus.INIT, TxStatus.HANDLED, TxStatus.IGNORED))
+
 class BaseDFUManager(ABC):
 
     @abstractmethod
@@ -1,132 +1,316 @@
-import json
+import struct
 from collections import namedtuple
 from pathlib import Path
+from typing import BinaryIO, Callable
 
-from zipfile import ZipFile, is_zipfile
-from tempfile import TemporaryDirectory as TmpDir
-from hashlib import sha256, sha512
-from zlib import crc32
+from zipfile import ZipFile, ZIP_STORED, is_zipfile
+from mmap import mmap, ACCESS_READ
+from hashlib import new as new_hash, file_digest
+from functools import partial
 
-from ..dfu_cc_pb2 import *
+try:
+    # zlib-ng folds the crc with PCLMULQDQ / ARMv8 CRC instructions
+    # where the cpu supports them, and is a drop-in for zlib.crc32
+    from zlib_ng.zlib_ng import crc32
+except ImportError:
+    from zlib import crc32
+
+# the bootloader checks transfers with the standard crc-32 (reflected
+# 0x04c11db7, initial value and final xor 0xffffffff), so make sure the
+# implementation picked up above agrees before relying on it
+if crc32(b"123456789") != 0xCBF43926:
+    from zlib import crc32
+
+try:
+    # orjson parses straight from the bytes read out of the zip
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+from ..error import DFUErrorCode
+
+# the pinned protobuf 5.x parses with the upb C runtime by default, so
+# PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION is left for the user to override
+from ..dfu_cc_pb2 import Packet, FwType, HashType
+
+# FwType values and names to the image names used in package manifests
+_FWTYPE_NORM: dict[int | str, str] = {}
+for _name, _value in FwType.items():
+    _FWTYPE_NORM[_value] = _FWTYPE_NORM[_name.lower()] = _name.lower()
+del _name, _value
+
+# hashlib names of the sha hash types
+_SHA_NAMES = {
+    HashType.SHA256:    'sha256',
+    HashType.SHA512:    'sha512',
+}
+
+# read size when hashing an image that hasn't been loaded into memory
+_HASH_CHUNK_SIZE = 64 * 1024
+
+def _sha_digest(name: str, src: bytes | memoryview | BinaryIO) -> bytes:
+    # file_digest reads into its own buffer and hashes with the gil
+    # released, so openssl's sha extensions path is used on large images
+    if isinstance(src, (bytes, memoryview)):
+        h = new_hash(name, src)
+    else:
+        h = file_digest(src, name)
+    # sha digests are sent to the target in reverse byte order
+    return h.digest()[::-1]
+
+def _crc_digest(src: bytes | memoryview | BinaryIO) -> bytes:
+    if isinstance(src, (bytes, memoryview)):
+        return crc32(src).to_bytes(4, 'little')
+    value = 0
+    while chunk := src.read(_HASH_CHUNK_SIZE):
+        value = crc32(chunk, value)
+    return value.to_bytes(4, 'little')
+
+# image hash functions by init packet hash type, each taking either the
+# image binary or a file object to stream it from
+_HASH_DISPATCH: dict[int, Callable[[bytes | memoryview | BinaryIO], bytes | None]] = {
+    HashType.NO_HASH:   lambda src: None,
+    HashType.CRC:       _crc_digest,
+    **{hashtype: partial(_sha_digest, name) for hashtype, name in _SHA_NAMES.items()},
+}
+
+_ZIP_LOCAL_HEADER_SIG = b"PK\x03\x04"
+_ZIP_LOCAL_HEADER_LENS = struct.Struct("<HH")     # file name length, extra field length
 
 class DFUImage:
+    # img_data and init_data are shared with the transfer code without
+    # copying, so they must be treated as immutable
     __slots__ = [
         'img_type',     # image type (bootloader, softdevice, application)
         'img_file',     # image file in zip
         'init_file',    # init packet file in zip
-        'img_data',     # image binary
         'init_data',    # init packet binary
         'init_pkt',     # init packet as Packet object
+        'init_crc',     # crc32 of the init packet binary
+        'pkg_path',     # path to the package zip the image is read from
+        '_img_data',    # image binary, read from the package on first use
+        '_img_view',    # memoryview over the image binary for zero-copy slicing
+        '_img_map',     # mmap of the package, if the image binary is mapped from it
+        'fw_hash',      # cached image hash, computed on first use
+        '_img_crc',     # crc32 of the image binary, computed on first use
     ]
 
     def __init__(self, 
         img_type: str,
         img_file: str,
         init_file: str,
-        img_data: bytearray,
-        init_data: bytearray,
+        init_data: bytes,
         init_pkt: Packet,
+        pkg_path: Path = None,
+        img_data: bytes = None,
     ):
+        if not pkg_path and img_data is None:
+            raise DFUErrorCode.FILE_NOT_SPECIFIED.as_err("expected a package path or image data")
         self.img_type   = img_type
         self.img_file   = img_file
         self.init_file  = init_file
-        self.img_data   = img_data
         self.init_data  = init_data
         self.init_pkt   = init_pkt
+        self.init_crc   = crc32(init_data)
+        self.pkg_path   = pkg_path
+        self._img_data  = img_data
+        self._img_view  = None
+        self._img_map   = None
+        self.fw_hash    = None
+        self._img_crc   = None
 
-class DFUPackage:
-    def __init__(self, path: Path):
-        assert isinstance(path, Path)
-        assert path.exists(), "file not found: {}".format(str(path))
-        assert is_zipfile(str(path)), "not a zipfile: {}".format(str(path))
-        self.path = path
-        self.images = {}
-
-        zf = ZipFile(str(path))
-        with TmpDir() as tmpdir:
-            zf.extractall(tmpdir)
-            with open(f"{tmpdir}/manifest.json", 'r') as f:
-                self.manifest = json.load(f)['manifest']
-
-            for target, data in self.manifest.items():
-                data['img_type'] = target
-                assert "bin_file" in data
-                assert "dat_file" in data
-
-                # rename items in package to something less confusing
-                data['img_file'] = data['bin_file']
-                data['init_file'] = data['dat_file']
-                del data['bin_file']
-                del data['dat_file']
-
-                with open(f"{tmpdir}/{data['img_file']}", 'rb') as img_file:
-                    data["img_data"] = img_file.read()
-                
-                with open(f"{tmpdir}/{data['init_file']}", 'rb') as init_file:
-                    data["init_data"] = init_file.read()
-                    data["init_pkt"] = Packet()
-                    data["init_pkt"].ParseFromString(data["init_data"])
-
-                self.images[target] = DFUImage(**data)
+    @property
+    def img_data(self) -> bytes | memoryview:
+        """image binary
 
-    def get_fw_data(self, fwtype: [int, str]) -> DFUImage:
-        if isinstance(fwtype, int):
-            fwtype = FwType.Name(fwtype)
-        assert isinstance(fwtype, str), "invalid fwtype param type: {}".format(type(fwtype))
-        fwtype = fwtype.upper()
-        assert fwtype in FwType.keys(), "invalid fwtype: {}".format(fwtype)
-        fwtype = fwtype.lower()
-        assert fwtype in self.images, "package missing fwtype: {}".format(fwtype)
-        return self.images[fwtype]
+        firmware images can be large and aren't needed just to inspect
+        init packets, so they're only read out of the package when used
+        """
+        if self._img_data is None:
+            self._img_map, self._img_data = _read_member(self.pkg_path, self.img_file)
+        return self._img_data
 
     @property
-    def has_bl(self):
-        return "bootloader" in self.images
+    def img_view(self) -> memoryview:
+        """read-only view of the image binary, slices of which don't copy"""
+        if self._img_view is None:
+            self._img_view = memoryview(self.img_data)
+        return self._img_view
 
     @property
-    def has_sd(self):
-        return "softdevice" in self.images
+    def img_crc(self) -> int:
+        """crc32 of the image binary, as the target reports it once fully received"""
+        if self._img_crc is None:
+            self._img_crc = crc32(self.img_data)
+        return self._img_crc
 
-    @property
-    def has_app(self):
-        return "app" in self._images
+    def close(self):
+        """release the image binary, unmapping it from the package if needed
 
-    def get_init_packet(self, fwtype: [int, str]) -> Packet:
-        return self.get_fw_data(fwtype).init_pkt
+        views taken from img_data or img_view should be dropped first. if
+        any are still around, the mapping is left for them and goes away
+        along with the last one
+        """
+        try:
+            if self._img_view is not None:
+                self._img_view.release()
+            if isinstance(self._img_data, memoryview):
+                self._img_data.release()
+            if self._img_map is not None:
+                self._img_map.close()
+        except BufferError:
+            pass
+        self._img_view = None
+        self._img_data = None
+        self._img_map = None
 
-    def get_fw_bin(self, fwtype: [int, str]) -> bytes:
-        return self.get_fw_data(fwtype).img_data
+    def gen_hash(self) -> [bytes, None]:
+        """hash of the image binary as specified by the init packet"""
+        if self.fw_hash is not None:
+            return self.fw_hash
 
-    def gen_fw_hash(self, fwtype: [int, str]) -> [bytes, None]:
-        fw_data = self.get_fw_data(fwtype)
-        packet = fw_data.init_pkt
-        fw_bin = fw_data.img_data
-        assert len(packet.ListFields()), "init packet missing fields!"
+        packet = self.init_pkt
+        if not len(packet.ListFields()):
+            raise DFUErrorCode.INIT_PACKET_REQUIRED.as_err("init packet missing fields!")
         if packet.HasField("signed_command"):
             command = packet.signed_command.command
         else:
             command = packet.command
 
-        assert command.HasField("init"), "not an InitCommand!"
-
-        hashtype = command.init.hash.hashimg_type
-
-        match hashtype:
-            case HashType.NO_HASH:
-                return None
-            case HashType.CRC:
-                return crc32(fw_bin).to_bytes(4, 'little')
-            case HashType.SHA128:
-                assert False, (
-                    "SHA128 is not a real hash function, "
-                    "the protobuf definition is wrong.")
-            case HashType.SHA256:
-                h = sha256()
-                h.update(fw_bin)
-                return bytes(reversed(h.digest()))
-            case HashType.SHA512:
-                h = sha512()
-                h.update(fw_bin)
-                return bytes(reversed(h.digest()))
-            case _:
-                assert False, "unreachable, invalid hash type: {}".format(hashtype)
\ No newline at end of file
+        if not command.HasField("init"):
+            raise DFUErrorCode.INIT_PACKET_REQUIRED.as_err("not an InitCommand!")
+
+        hashtype = command.init.hash.hash_type
+
+        if hashtype == HashType.SHA128:
+            raise DFUErrorCode.FILE_INVALID.as_err(
+                "SHA128 is not a real hash function, "
+                "the protobuf definition is wrong.")
+        hasher = _HASH_DISPATCH.get(hashtype)
+        if not hasher:
+            raise DFUErrorCode.FILE_INVALID.as_err("invalid hash type: {}".format(hashtype))
+
+        # an image that hasn't been read yet is streamed out of the package,
+        # so hashing doesn't hold a second firmware-sized copy in memory
+        if self._img_data is not None:
+            fw_hash = hasher(self._img_data)
+        else:
+            with ZipFile(str(self.pkg_path)) as zf, zf.open(self.img_file) as f:
+                fw_hash = hasher(f)
+
+        # images never change once loaded, so the hash only needs computing once
+        self.fw_hash = fw_hash
+        return fw_hash
+
+
+def _read_member(path: Path, name: str) -> tuple[mmap | None, bytes | memoryview]:
+    """read a member out of a package zip
+
+    uncompressed members are mapped straight out of the zip so the data is
+    backed by the page cache instead of being copied onto the python heap.
+    compressed members have to be inflated, so they're read as usual.
+    returns the mmap (or None) and the member data.
+    """
+    with ZipFile(str(path)) as zf:
+        info = zf.getinfo(name)
+        if info.compress_type != ZIP_STORED or info.flag_bits & 0x1 or not info.file_size:
+            return None, zf.read(name)
+
+    with open(str(path), 'rb') as f:
+        mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+
+    # the data follows the member's local file header, whose name and
+    # extra field lengths may differ from the central directory's
+    if mm[info.header_offset:info.header_offset + 4] != _ZIP_LOCAL_HEADER_SIG:
+        mm.close()
+        with ZipFile(str(path)) as zf:
+            return None, zf.read(name)
+    name_len, extra_len = _ZIP_LOCAL_HEADER_LENS.unpack_from(mm, info.header_offset + 26)
+    start = info.header_offset + 30 + name_len + extra_len
+    return mm, memoryview(mm)[start:start + info.file_size]
+
+
+def _load_image(zf: ZipFile, target: str, data: dict) -> DFUImage:
+    """read and parse the init packet of a single image described by the manifest"""
+    data['img_type'] = target
+    if "bin_file" not in data:
+        raise DFUErrorCode.FILE_INVALID.as_err("{} missing bin_file".format(target))
+    if "dat_file" not in data:
+        raise DFUErrorCode.INIT_PACKET_REQUIRED.as_err("{} missing dat_file".format(target))
+
+    # rename items in package to something less confusing
+    data['img_file'] = data['bin_file']
+    data['init_file'] = data['dat_file']
+    del data['bin_file']
+    del data['dat_file']
+
+    data["pkg_path"] = Path(zf.filename)
+    data["init_data"] = zf.read(data['init_file'])
+    data["init_pkt"] = Packet()
+    data["init_pkt"].ParseFromString(data["init_data"])
+
+    return DFUImage(**data)
+
+
+class DFUPackage:
+    __slots__ = [
+        'path',         # path to the package zip
+        'manifest',     # package manifest.json contents
+        'images',       # dict of DFUImage by image type
+        'has_bl',       # package contains a bootloader image
+        'has_sd',       # package contains a softdevice image
+        'has_app',      # package contains an application image
+        '_fw_data',     # images by every fwtype key already looked up
+    ]
+
+    def __init__(self, path: Path):
+        if not isinstance(path, Path):
+            raise DFUErrorCode.FILE_NOT_SPECIFIED.as_err("invalid path type: {}".format(type(path)))
+        if not path.exists():
+            raise DFUErrorCode.FILE_NOT_SPECIFIED.as_err("file not found: {}".format(str(path)))
+        if not is_zipfile(str(path)):
+            raise DFUErrorCode.FILE_INVALID.as_err("not a zipfile: {}".format(str(path)))
+        self.path = path
+
+        # read members straight out of the archive instead of extracting
+        # everything to a temporary directory first
+        with ZipFile(str(path)) as zf:
+            self.manifest = json_loads(zf.read("manifest.json"))['manifest']
+            self.images = {
+                target: _load_image(zf, target, data)
+                for target, data in self.manifest.items()
+            }
+
+        self.has_bl = "bootloader" in self.images
+        self.has_sd = "softdevice" in self.images
+        self.has_app = "application" in self.images
+        self._fw_data = {}
+
+    def get_fw_data(self, fwtype: [int, str]) -> DFUImage:
+        # callers use the same few keys over and over, so remember which
+        # image each resolved to and skip normalizing them again
+        img = self._fw_data.get(fwtype)
+        if img is not None:
+            return img
+        try:
+            name = _FWTYPE_NORM[fwtype.lower() if isinstance(fwtype, str) else fwtype]
+        except KeyError:
+            raise DFUErrorCode.FILE_INVALID.as_err("invalid fwtype: {}".format(fwtype)) from None
+        if name not in self.images:
+            raise DFUErrorCode.FILE_INVALID.as_err("package missing fwtype: {}".format(name))
+        img = self._fw_data[fwtype] = self.images[name]
+        return img
+
+    def get_init_packet(self, fwtype: [int, str]) -> Packet:
+        return self.get_fw_data(fwtype).init_pkt
+
+    def get_fw_bin(self, fwtype: [int, str]) -> bytes:
+        return self.get_fw_data(fwtype).img_data
+
+    def close(self):
+        """release all image binaries read from the package"""
+        for img in self.images.values():
+            img.close()
+
+    def gen_fw_hash(self, fwtype: [int, str]) -> [bytes, None]:
+        return self.get_fw_data(fwtype).gen_hash()
\ No newline at end of file
@@ -1,3 +1,4 @@
+import struct
 from typing import assert_never
 from collections import namedtuple
 from enum import Enum
@@ -28,40 +29,45 @@ class SecureDFUOpcode(int, Enum):
         return self.name
 
     def macro(self):
-        return f"NRF_DFU_OP_{self.name}"
+        return _OPCODE_MACROS[self]
 
     @property
     def description(self) -> str:
-        match self:
-            case self.PROTOCOL_VERSION:  return "Get Protocol Version"
-            case self.OBJECT_CREATE:     return "Create Object"
-            case self.RECEIPT_NOTIF_SET: return "Set PRN Value"
-            case self.CRC_GET:           return "Calculate Checksum"
-            case self.OBJECT_EXECUTE:    return "Execute"
-            case self.OBJECT_SELECT:     return "Select Object"
-            case self.MTU_GET:           return "Get MTU"
-            case self.OBJECT_WRITE:      return "Write"
-            case self.PING:              return "Ping"
-            case self.HARDWARE_VERSION:  return "Get Hw Version"
-            case self.FIRMWARE_VERSION:  return "Get Fw Version"
-            case self.ABORT:             return "Abort"
-            case self.RESPONSE:          return "Response"
-            case _:                 assert_never("Invalid opcode")
+        return _OPCODE_DESC[self]
 
     def to_bytes(self) -> bytes:
-        return self.value.to_bytes(1, 'little')
+        return _OPCODE_BYTES[self]
+
+# the opcode set is fixed, so serialize each one once
+_OPCODE_BYTES = {op: bytes((op.value,)) for op in SecureDFUOpcode}
+_OPCODE_MACROS = {op: f"NRF_DFU_OP_{op.name}" for op in SecureDFUOpcode}
+_OPCODE_DESC = {
+    SecureDFUOpcode.PROTOCOL_VERSION:  "Get Protocol Version",
+    SecureDFUOpcode.OBJECT_CREATE:     "Create Object",
+    SecureDFUOpcode.RECEIPT_NOTIF_SET: "Set PRN Value",
+    SecureDFUOpcode.CRC_GET:           "Calculate Checksum",
+    SecureDFUOpcode.OBJECT_EXECUTE:    "Execute",
+    SecureDFUOpcode.OBJECT_SELECT:     "Select Object",
+    SecureDFUOpcode.MTU_GET:           "Get MTU",
+    SecureDFUOpcode.OBJECT_WRITE:      "Write",
+    SecureDFUOpcode.PING:              "Ping",
+    SecureDFUOpcode.HARDWARE_VERSION:  "Get Hw Version",
+    SecureDFUOpcode.FIRMWARE_VERSION:  "Get Fw Version",
+    SecureDFUOpcode.ABORT:             "Abort",
+    SecureDFUOpcode.RESPONSE:          "Response",
+}
 
 
 class SecureDFUExtendedErrorCode(int, Enum):
     """extended error codes that are converted to DFUErrorCode"""
     NO_ERROR                = 0x00
-    # WRONG_COMMAND_FORMAT    = 0x02
+    WRONG_COMMAND_FORMAT    = 0x02
     UNKNOWN_COMMAND         = 0x03
     INIT_COMMAND_INVALID    = 0x04
     FW_VERSION_FAILURE      = 0x05
     HW_VERSION_FAILURE      = 0x06
     SD_VERSION_FAILURE      = 0x07
-    # SIGNATURE_MISSING       = 0x08
+    SIGNATURE_MISSING       = 0x08
     WRONG_HASH_TYPE         = 0x09
     HASH_FAILED             = 0x0A
     WRONG_SIGNATURE_TYPE    = 0x0B
@@ -77,21 +83,23 @@ class SecureDFUExtendedErrorCode(int, Enum):
 
     @property
     def description(self):
-        match self:
-            case self.NO_ERROR:              return "No error"
-            # case self.WRONG_COMMAND_FORMAT:  return "Wrong command format"
-            case self.UNKNOWN_COMMAND:       return "Unknown command"
-            case self.INIT_COMMAND_INVALID:  return "Init command was invalid"
-            case self.FW_VERSION_FAILURE:    return "FW version check failed"
-            case self.HW_VERSION_FAILURE:    return "HW version check failed"
-            case self.SD_VERSION_FAILURE:    return "SD version check failed"
-            # case self.SIGNATURE_MISSING:     return "Signature missing"
-            case self.WRONG_HASH_TYPE:       return "Invalid hash type"
-            case self.HASH_FAILED:           return "Hashing failed"
-            case self.WRONG_SIGNATURE_TYPE:  return "Invalid signature type"
-            case self.VERIFICATION_FAILED:   return "Verification failed"
-            case self.INSUFFICIENT_SPACE:    return "Insufficient space for upgrade"
-            case _:                     assert_never("Invalid error code")
+        return _EXTENDED_ERROR_DESC[self]
+
+_EXTENDED_ERROR_DESC = {
+    SecureDFUExtendedErrorCode.NO_ERROR:              "No error",
+    SecureDFUExtendedErrorCode.WRONG_COMMAND_FORMAT:  "Wrong command format",
+    SecureDFUExtendedErrorCode.UNKNOWN_COMMAND:       "Unknown command",
+    SecureDFUExtendedErrorCode.INIT_COMMAND_INVALID:  "Init command was invalid",
+    SecureDFUExtendedErrorCode.FW_VERSION_FAILURE:    "FW version check failed",
+    SecureDFUExtendedErrorCode.HW_VERSION_FAILURE:    "HW version check failed",
+    SecureDFUExtendedErrorCode.SD_VERSION_FAILURE:    "SD version check failed",
+    SecureDFUExtendedErrorCode.SIGNATURE_MISSING:     "Signature missing",
+    SecureDFUExtendedErrorCode.WRONG_HASH_TYPE:       "Invalid hash type",
+    SecureDFUExtendedErrorCode.HASH_FAILED:           "Hashing failed",
+    SecureDFUExtendedErrorCode.WRONG_SIGNATURE_TYPE:  "Invalid signature type",
+    SecureDFUExtendedErrorCode.VERIFICATION_FAILED:   "Verification failed",
+    SecureDFUExtendedErrorCode.INSUFFICIENT_SPACE:    "Insufficient space for upgrade",
+}
 
 
 class SecureDFUProcedureType(int, Enum):
@@ -100,10 +108,13 @@ class SecureDFUProcedureType(int, Enum):
     DATA    = 2
 
     def macro(self):
-        return f"NRF_DFU_OBJ_TYPE_{self.name}"
+        return _PROCEDURE_TYPE_MACROS[self]
 
     def to_bytes(self):
-        return self.value.to_bytes(1, 'little')
+        return _PROCEDURE_TYPE_BYTES[self]
+
+_PROCEDURE_TYPE_BYTES = {t: bytes((t.value,)) for t in SecureDFUProcedureType}
+_PROCEDURE_TYPE_MACROS = {t: f"NRF_DFU_OBJ_TYPE_{t.name}" for t in SecureDFUProcedureType}
 
 class SecureDFUImageType(int, Enum):
     """corresponding to nrf_dfu_firmware_type_t received in response"""
@@ -117,7 +128,9 @@ class SecureDFUImageType(int, Enum):
         return cls.UNKNOWN
 
     def to_bytes(self):
-        return self.value.to_bytes(1, 'little')
+        return _IMAGE_TYPE_BYTES[self]
+
+_IMAGE_TYPE_BYTES = {t: bytes((t.value,)) for t in SecureDFUImageType}
 
 class SecureDFUResultCode(int, Enum):
     INVALID                 = 0x00
@@ -132,30 +145,73 @@ class SecureDFUResultCode(int, Enum):
     EXTENDED_ERROR          = 0x0B
 
     def macro(self):
-        return f"NRF_DFU_RES_CODE_{self.name}"
+        return _RESULT_CODE_MACROS[self]
 
     def error(self):
         return DFUErrorCode[f"REMOTE_SECURE_DFU_{self.name}"]
 
     @property
     def description(self):
-        match self:
-            case self.INVALID:                   return "INVALID CODE"
-            case self.SUCCESS:                   return "SUCCESS"
-            case self.OPCODE_NOT_SUPPORTED:      return "OPERATION NOT SUPPORTED"
-            case self.INVALID_PARAMETER:         return "INVALID PARAMETER"
-            case self.INSUFFICIENT_RESOURCES:    return "INSUFFICIENT RESOURCES"
-            case self.INVALID_OBJECT:            return "INVALID OBJECT"
-            case self.UNSUPPORTED_TYPE:          return "UNSUPPORTED TYPE"
-            case self.OPERATION_NOT_PERMITTED:   return "OPERATION NOT PERMITTED"
-            case self.OPERATION_FAILED:          return "OPERATION FAILED"
-            case self.EXTENDED_ERROR:            return "EXTENDED ERROR"
+        return _RESULT_CODE_DESC[self]
 
     @property
     def code(self):
         return self.value
 
+_RESULT_CODE_MACROS = {code: f"NRF_DFU_RES_CODE_{code.name}" for code in SecureDFUResultCode}
+_RESULT_CODE_DESC = {
+    SecureDFUResultCode.INVALID:                   "INVALID CODE",
+    SecureDFUResultCode.SUCCESS:                   "SUCCESS",
+    SecureDFUResultCode.OPCODE_NOT_SUPPORTED:      "OPERATION NOT SUPPORTED",
+    SecureDFUResultCode.INVALID_PARAMETER:         "INVALID PARAMETER",
+    SecureDFUResultCode.INSUFFICIENT_RESOURCES:    "INSUFFICIENT RESOURCES",
+    SecureDFUResultCode.INVALID_OBJECT:            "INVALID OBJECT",
+    SecureDFUResultCode.UNSUPPORTED_TYPE:          "UNSUPPORTED TYPE",
+    SecureDFUResultCode.OPERATION_NOT_PERMITTED:   "OPERATION NOT PERMITTED",
+    SecureDFUResultCode.OPERATION_FAILED:          "OPERATION FAILED",
+    SecureDFUResultCode.EXTENDED_ERROR:            "EXTENDED ERROR",
+}
+
+# members by raw value, for decoding notifications without going through
+# the enum constructors
+_OPCODE_VALUES = {op.value: op for op in SecureDFUOpcode}
+_RESULT_CODE_VALUES = {code.value: code for code in SecureDFUResultCode}
+_EXTENDED_ERROR_VALUES = {code.value: code for code in SecureDFUExtendedErrorCode}
+
+def _decode(table: dict, value: int, field: str, data: bytearray):
+    """look up a notification field, rejecting values the tables don't know"""
+    try:
+        return table[value]
+    except KeyError:
+        raise DFUErrorCode.UNSUPPORTED_RESPONSE.as_err(
+            "unknown {} {:#04x} in [ {} ]".format(field, value, hexlify(data, ' '))) from None
+
+def _require(data: bytearray, size: int, what: str):
+    """reject a notification too short to hold what its header says follows"""
+    if len(data) < size:
+        raise DFUErrorCode.UNSUPPORTED_RESPONSE.as_err(
+            "{} needs {} bytes, got [ {} ]".format(what, size, hexlify(data, ' ')))
+
+# request layouts, all little endian and led by the opcode
+_CREATE_FMT     = struct.Struct("<BBI")     # object type, object size
+_SELECT_FMT     = struct.Struct("<BB")      # object type
+_PRN_FMT        = struct.Struct("<BH")      # prn value
+_PING_FMT       = struct.Struct("<BB")      # ping id
+_FW_VERSION_FMT = struct.Struct("<BB")      # image type
+_LEN_FMT        = struct.Struct("<H")       # trailing write payload length
+
 class SecureDFURequest:
+    __slots__ = [
+        "opcode",
+        "data",
+        "object_type",
+        "object_size",
+        "prn_value",
+        "payload",
+        "ping_id",
+        "image_type",
+    ]
+
     def __init__(self,
         opcode: SecureDFUOpcode,
         object_type: SecureDFUProcedureType = None,
@@ -166,39 +222,115 @@ class SecureDFURequest:
         image_type: SecureDFUImageType = None,
     ):
         self.opcode = opcode
-        self.data = bytearray(opcode.to_bytes())
         match opcode:
             case SecureDFUOpcode.OBJECT_CREATE:
                 assert object_type, "expected command or data type"
                 assert object_size, "expected nonzero object size"
-                self.data.extend(object_type.to_bytes())
-                self.data.extend(object_size.to_bytes(4, 'little'))
+                self.data = _CREATE_FMT.pack(opcode, object_type, object_size)
                 self.object_type = object_type
                 self.object_size = object_size
             case SecureDFUOpcode.OBJECT_SELECT:
                 assert object_type, "expected command or data type"
-                self.data.extend(object_type.to_bytes())
+                self.data = _SELECT_FMT.pack(opcode, object_type)
                 self.object_type = object_type
             case SecureDFUOpcode.RECEIPT_NOTIF_SET:
                 assert prn_value is not None, "PRN value must be specified"
-                self.data.extend(prn_value.to_bytes(2, 'little'))
+                self.data = _PRN_FMT.pack(opcode, prn_value)
                 self.prn_value = prn_value
             case SecureDFUOpcode.OBJECT_WRITE:
                 assert payload is not None, "expected a payload"
                 assert len(payload) <= 20, "20 bytes can be sent at once at most"
-                self.data.extend(payload)
-                self.data.extend(len(payload).to_bytes(2, 'little'))
+                # join sizes the result once instead of growing it per part
+                self.data = b"".join((_OPCODE_BYTES[opcode], payload, _LEN_FMT.pack(len(payload))))
                 self.payload = payload
             case SecureDFUOpcode.PING:
                 assert ping_id is not None, "expected a ping_id"
-                self.data.extend(ping_id.to_bytes(1, 'little'))
+                self.data = _PING_FMT.pack(opcode, ping_id)
                 self.ping_id = ping_id
             case SecureDFUOpcode.FIRMWARE_VERSION:
                 assert image_type is not None, "expected an image type"
-                self.data.extend(image_type.to_bytes())
+                self.data = _FW_VERSION_FMT.pack(opcode, image_type)
                 self.image_type = image_type
             case _:
-                pass
+                self.data = opcode.to_bytes()
+
+    # each caller knows which request it's sending, so these build the
+    # request bytes directly instead of dispatching on the opcode
+
+    @classmethod
+    def _build(cls, opcode: SecureDFUOpcode, data: bytes) -> "SecureDFURequest":
+        req = cls.__new__(cls)
+        req.opcode = opcode
+        req.data = data
+        return req
+
+    @classmethod
+    def create(cls, object_type: SecureDFUProcedureType, object_size: int) -> "SecureDFURequest":
+        # every object but an image's last is created at the target's max
+        # object size, so the same few requests are shared like set_prn's
+        req = _CREATE_REQUESTS.get((object_type, object_size))
+        if req is None:
+            assert object_type, "expected command or data type"
+            assert object_size, "expected nonzero object size"
+            req = cls._build(SecureDFUOpcode.OBJECT_CREATE,
+                _CREATE_FMT.pack(SecureDFUOpcode.OBJECT_CREATE, object_type, object_size))
+            req.object_type = object_type
+            req.object_size = object_size
+            _CREATE_REQUESTS[object_type, object_size] = req
+        return req
+
+    @classmethod
+    def select(cls, object_type: SecureDFUProcedureType) -> "SecureDFURequest":
+        assert object_type, "expected command or data type"
+        req = cls._build(SecureDFUOpcode.OBJECT_SELECT,
+            _SELECT_FMT.pack(SecureDFUOpcode.OBJECT_SELECT, object_type))
+        req.object_type = object_type
+        return req
+
+    @classmethod
+    def set_prn(cls, prn_value: int) -> "SecureDFURequest":
+        # only a handful of prn values are ever used, and the prn is set
+        # around every object, so each one is built once and shared
+        req = _PRN_REQUESTS.get(prn_value)
+        if req is None:
+            req = cls._build(SecureDFUOpcode.RECEIPT_NOTIF_SET,
+                _PRN_FMT.pack(SecureDFUOpcode.RECEIPT_NOTIF_SET, prn_value))
+            req.prn_value = prn_value
+            _PRN_REQUESTS[prn_value] = req
+        return req
+
+    @classmethod
+    def write(cls, payload: bytes) -> "SecureDFURequest":
+        assert len(payload) <= 20, "20 bytes can be sent at once at most"
+        req = cls._build(SecureDFUOpcode.OBJECT_WRITE,
+            b"".join((_OPCODE_BYTES[SecureDFUOpcode.OBJECT_WRITE], payload, _LEN_FMT.pack(len(payload)))))
+        req.payload = payload
+        return req
+
+    @classmethod
+    def ping(cls, ping_id: int) -> "SecureDFURequest":
+        req = cls._build(SecureDFUOpcode.PING, _PING_FMT.pack(SecureDFUOpcode.PING, ping_id))
+        req.ping_id = ping_id
+        return req
+
+    @classmethod
+    def fw_version(cls, image_type: SecureDFUImageType) -> "SecureDFURequest":
+        req = cls._build(SecureDFUOpcode.FIRMWARE_VERSION,
+            _FW_VERSION_FMT.pack(SecureDFUOpcode.FIRMWARE_VERSION, image_type))
+        req.image_type = image_type
+        return req
+
+    @classmethod
+    def crc_get(cls) -> "SecureDFURequest":
+        return _BARE_REQUESTS[SecureDFUOpcode.CRC_GET]
+
+    @classmethod
+    def execute(cls) -> "SecureDFURequest":
+        return _BARE_REQUESTS[SecureDFUOpcode.OBJECT_EXECUTE]
+
+    @classmethod
+    def abort(cls) -> "SecureDFURequest":
+        return _BARE_REQUESTS[SecureDFUOpcode.ABORT]
 
     @property
     def description(self):
@@ -216,8 +348,36 @@ class SecureDFURequest:
             case SecureDFUOpcode.FIRMWARE_VERSION:  return f"GET FW VERSION {{ type={self.image_type.name} }} [ {hexlify(self.data, ' ')} ]"
             case SecureDFUOpcode.ABORT:             return f"ABORT [ {hexlify(self.data, ' ')} ]"
             case _:                                 assert_never("Invalid opcode")
+
+    # descriptions are formatted by str(), so passing a request as a logging
+    # argument only builds the hex dump when the record is actually emitted
+    def __str__(self):
+        return self.description
     
 
+# requests without parameters are always the same bytes, so they're built
+# once and shared. CRC_GET in particular goes out after every PRN window.
+_BARE_REQUESTS: dict[SecureDFUOpcode, SecureDFURequest] = {
+    op: SecureDFURequest._build(op, _OPCODE_BYTES[op]) for op in (
+        SecureDFUOpcode.PROTOCOL_VERSION,
+        SecureDFUOpcode.CRC_GET,
+        SecureDFUOpcode.OBJECT_EXECUTE,
+        SecureDFUOpcode.MTU_GET,
+        SecureDFUOpcode.HARDWARE_VERSION,
+        SecureDFUOpcode.ABORT,
+    )
+}
+
+# RECEIPT_NOTIF_SET requests by prn value, filled in as they're used
+_PRN_REQUESTS: dict[int, SecureDFURequest] = {}
+
+# OBJECT_CREATE requests by object type and size, filled in as they're used
+_CREATE_REQUESTS: dict[tuple[SecureDFUProcedureType, int], SecureDFURequest] = {}
+
+# response payload layouts, following the opcode, request opcode and status
+_SELECT_RES_FMT = struct.Struct("<III")     # max size, offset, crc
+_CRC_RES_FMT    = struct.Struct("<II")      # offset, crc
+
 class SecureDFUResponse:
     __slots__ = [
         "data",
@@ -232,12 +392,18 @@ class SecureDFUResponse:
 
     def __init__(self, data: bytearray):
         assert isinstance(data, bytearray)
-        assert len(data) >= 3, "not enough data, invalid response"
+        _require(data, 3, "response")
         self.data = data
-        self.opcode = SecureDFUOpcode(data[0])
-        assert self.opcode == SecureDFUOpcode.RESPONSE, "not a DFU response"
-        self.req_opcode = SecureDFUOpcode(data[1])
-        self.status = SecureDFUResultCode(data[2])
+        # RESPONSE is the only valid opcode, and nearly every response is
+        # a success, so check for those before falling back to the tables
+        if data[0] != SecureDFUOpcode.RESPONSE:
+            raise DFUErrorCode.UNSUPPORTED_RESPONSE.as_err(
+                "not a DFU response: [ {} ]".format(hexlify(data, ' ')))
+        self.opcode = SecureDFUOpcode.RESPONSE
+        self.req_opcode = _decode(_OPCODE_VALUES, data[1], "request opcode", data)
+        status = data[2]
+        self.status = SecureDFUResultCode.SUCCESS if status == SecureDFUResultCode.SUCCESS \
+            else _decode(_RESULT_CODE_VALUES, status, "result code", data)
 
         self.max_size = None
         self.offset = None
@@ -255,22 +421,19 @@ class SecureDFUResponse:
         # self.fw_size = None
 
         if self.status == SecureDFUResultCode.EXTENDED_ERROR:
-            assert len(data) >= 4, "not enough data, expected extended error code"
-            self.error = SecureDFUExtendedErrorCode(int.from_bytes(data[3], 'little'))
+            _require(data, 4, "extended error")
+            self.error = _decode(_EXTENDED_ERROR_VALUES, data[3], "extended error code", data)
             return
         elif self.status != SecureDFUResultCode.SUCCESS:
             return
 
         match self.req_opcode:
             case SecureDFUOpcode.OBJECT_SELECT:
-                assert len(data) >= 15, "additional 12 bytes expected for SELECT response"
-                self.max_size = int.from_bytes(data[3:7], 'little')
-                self.offset = int.from_bytes(data[7:11], 'little')
-                self.crc = int.from_bytes(data[11:15], 'little')
+                _require(data, 15, "SELECT response")
+                self.max_size, self.offset, self.crc = _SELECT_RES_FMT.unpack_from(data, 3)
             case SecureDFUOpcode.CRC_GET:
-                assert len(data) >= 11, "additional 8 bytes expected for CRC command"
-                self.offset = int.from_bytes(data[3:7], 'little')
-                self.crc = int.from_bytes(data[7:11], 'little')
+                _require(data, 11, "CRC response")
+                self.offset, self.crc = _CRC_RES_FMT.unpack_from(data, 3)
             case _:
                 pass
 
@@ -278,7 +441,7 @@ class SecureDFUResponse:
     def description(self):
         status = self.status.description
         if self.status == SecureDFUResultCode.EXTENDED_ERROR:
-            details = self.error
+            return f"RESPONSE: {self.req_opcode.name} - {status}:[ {self.error.description} ]"
         elif self.status != SecureDFUResultCode.SUCCESS:
             return f"RESPONSE: {self.req_opcode.name} - {status}"
 
@@ -292,6 +455,9 @@ class SecureDFUResponse:
 
         return f"RESPONSE: {self.req_opcode.name} - {status}:{details}"
 
+    def __str__(self):
+        return self.description
+
     def ok(self):
         return self.status == SecureDFUResultCode.SUCCESS
 
@@ -303,31 +469,37 @@ class SecureDFUPacketReceiptNotification:
         "status",
         "offset",
         "crc",
+        "error",
     ]
 
     def __init__(self, data):
-        assert len(data) >= 3, "malformed response data: {}".format(hexlify(data, ' '))
-        self.opcode = SecureDFUOpcode(data[0])
-        self.req_opcode = SecureDFUOpcode(data[1])
-        self.status = SecureDFUResultCode(data[2])
+        _require(data, 3, "PRN")
+        self.opcode = _decode(_OPCODE_VALUES, data[0], "opcode", data)
+        self.req_opcode = _decode(_OPCODE_VALUES, data[1], "request opcode", data)
+        status = data[2]
+        self.status = SecureDFUResultCode.SUCCESS if status == SecureDFUResultCode.SUCCESS \
+            else _decode(_RESULT_CODE_VALUES, status, "result code", data)
+
+        self.offset = None
+        self.crc = None
+        self.error = None
 
         if self.status == SecureDFUResultCode.EXTENDED_ERROR:
-            assert len(data) >= 4, "not enough data, expected extended error code"
-            self.error = SecureDFUExtendedErrorCode(int.from_bytes(data[3], 'little'))
+            _require(data, 4, "extended error")
+            self.error = _decode(_EXTENDED_ERROR_VALUES, data[3], "extended error code", data)
             return
         elif self.status != SecureDFUResultCode.SUCCESS:
             return
 
-        assert len(data) >= 11, "PRN always has at least 11 bytes"
-        self.offset = int.from_bytes(data[3:7], 'little')
-        self.crc = int.from_bytes(data[7:11], 'little')
+        _require(data, 11, "PRN")
+        self.offset, self.crc = _CRC_RES_FMT.unpack_from(data, 3)
 
 
     @property
     def description(self):
         status = self.status.description
         if self.status == SecureDFUResultCode.EXTENDED_ERROR:
-            details = self.error
+            details = f"[ {self.error.description} ]"
         elif self.status != SecureDFUResultCode.SUCCESS:
             return f"PRN: {self.req_opcode.name} - {status}"
         else:
@@ -335,5 +507,8 @@ class SecureDFUPacketReceiptNotification:
 
         return f"PRN: {self.req_opcode.name} - {status}:{details}"
 
+    def __str__(self):
+        return self.description
+
     def ok(self):
         return self.status == SecureDFUResultCode.SUCCESS    
@@ -1,4 +1,5 @@
 import os
+import socket
 import asyncio
 import logging
 import time
@@ -7,9 +8,8 @@ from abc import ABC, abstractmethod
 from typing import Any, assert_never
 from logging import Logger
 from enum import Enum
-from asyncio import Queue, QueueEmpty
-from collections import namedtuple
-from zlib import crc32
+from asyncio import Event
+from collections import namedtuple, deque
 from binascii import hexlify
 
 import bleak
@@ -17,6 +17,12 @@ from bleak import BleakScanner, BleakClient
 from bleak.backends.device import BLEDevice
 from bleak.backends.service import BleakGATTCharacteristic
 
+try:
+    # bleak talks to bluez over dbus-fast, so it's only around on linux
+    from dbus_fast import Message, MessageType
+except ImportError:
+    Message = None
+
 from ..error import (
     DFUError,
     DFUErrorCode ,
@@ -38,6 +44,7 @@ from ..models import (
 from ..models.package import (
     DFUImage,
     DFUPackage,
+    crc32,
 )
 
 from ..models.secure import (
@@ -58,10 +65,11 @@ def check_response(res: Response):
     elif not res.ok():
         raise res.status.error().as_err()
 
-def check_status(state: TxStatus):
-    """a helper function to check handler status codes"""
-    # not yet implemented
-    pass
+def check_prn_window(prn_window: int) -> int:
+    """check a prn window fits the 16 bit value it's sent to the target as"""
+    if not 0 <= prn_window <= 0xFFFF:
+        raise ValueError(f"prn window must be between 0 and 65535, got {prn_window}")
+    return prn_window
 
 
 class SecureDFUClient(BleakClient):
@@ -70,17 +78,103 @@ class SecureDFUClient(BleakClient):
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.ctl_char = None
+        self.pkt_char = None
+        self.pkt_sock = None
+        self.pkt_mtu = None
+
+    def resolve_chars(self):
+        """look up the dfu characteristics once connected
+        writes then pass the characteristics themselves, so bleak doesn't
+        have to look them up by uuid for every packet
+        """
+        self.ctl_char = self.services.get_characteristic(DFU_CTRL_POINT_UUID)
+        self.pkt_char = self.services.get_characteristic(DFU_PACKET_UUID)
 
     async def write_ctl(self, request: Request, response=True):
         """send request to control point characteristic"""
         # log.info(f"REQUEST: {request.description}")
-        await self.write_gatt_char(DFU_CTRL_POINT_UUID, request.data, response=response)
+        await self.write_gatt_char(self.ctl_char, request.data, response=response)
+
+    async def acquire_pkt_socket(self) -> bool:
+        """acquire a socket to write packets through, if the backend allows it
+
+        on bluez every write_gatt_char is a d-bus method call, which costs far
+        more than the packet itself. AcquireWrite hands back a socket that
+        bluez forwards writes from as write commands, and that blocks once
+        its buffer fills. returns False (and packets are written through
+        bleak) on other backends, and raises if bluez refuses or the reply
+        can't be used, with nothing left acquired
+        """
+        bus = getattr(self._backend, "_bus", None)
+        if Message is None or bus is None:
+            return False
+
+        # bleak has kept the characteristic's object path in different places
+        obj = self.pkt_char.obj
+        path = obj[0] if isinstance(obj, tuple) else getattr(self.pkt_char, "path", None)
+        if not path:
+            return False
+
+        fds = []
+        try:
+            reply = await bus.call(Message(
+                destination="org.bluez",
+                path=path,
+                interface="org.bluez.GattCharacteristic1",
+                member="AcquireWrite",
+                signature="a{sv}",
+                body=[{}],
+            ))
+            fds = reply.unix_fds or []
+            if reply.message_type != MessageType.METHOD_RETURN:
+                raise RuntimeError(f"AcquireWrite failed: {reply.error_name} {reply.body}")
+            # the reply body is (fd, mtu), and the fd itself comes alongside it
+            if not fds or len(reply.body) < 2:
+                raise RuntimeError(f"unexpected AcquireWrite reply: {reply.body} with {len(fds)} fds")
+
+            self.pkt_sock = socket.socket(fileno=fds[0])
+            fds = fds[1:]
+            self.pkt_sock.setblocking(False)
+            # bluez reports the negotiated att mtu along with the socket
+            self.pkt_mtu = int(reply.body[1])
+        except BaseException:
+            if self.pkt_sock is not None:
+                self.pkt_sock.close()
+                self.pkt_sock = None
+            self.pkt_mtu = None
+            raise
+        finally:
+            # only the first fd is ever used
+            for fd in fds:
+                os.close(fd)
+        return True
+
+    async def disconnect(self) -> None:
+        if self.pkt_sock is not None:
+            self.pkt_sock.close()
+            self.pkt_sock = None
+            self.pkt_mtu = None
+        return await super().disconnect()
+
+    def max_pkt_size(self) -> int:
+        """largest packet that fits in a single write to the packet characteristic
+        this is the negotiated ATT MTU less the 3 byte header, and never below 20
+        """
+        # bluez older than 5.62 doesn't expose the mtu on the characteristic,
+        # so bleak assumes the minimum there. AcquireWrite still reports it
+        if self.pkt_mtu:
+            return max(self.pkt_mtu - 3, self.pkt_char.max_write_without_response_size)
+        return self.pkt_char.max_write_without_response_size
 
     async def write_pkt(self, pkt_data: bytearray):
         """send data to packet characteristic"""
-        assert len(pkt_data) <= 20, "gatt packet data must be <= 20 bytes"
         # log.debug(f"Sending GATT packet: [ {hexlify(pkt_data, ' ')} ]")
-        await self.write_gatt_char(DFU_PACKET_UUID, pkt_data, response=False)
+        if self.pkt_sock is not None:
+            # each send on the seqpacket socket is a single write command
+            await asyncio.get_running_loop().sock_sendall(self.pkt_sock, pkt_data)
+        else:
+            await self.write_gatt_char(self.pkt_char, pkt_data, response=False)
 
 
 class SecureTxState(Enum):
@@ -96,27 +190,11 @@ class SecureTxState(Enum):
     TRANSFER_DONE           = 9
 
     @property
-    def handler(self):
-        match self:
-            case self.DISCONNECTED:            return DisconnectedStateHandler
-            case self.CONNECTING:              return ConnectingStateHandler
-            case self.TRANSFER_READY:          return TransferReadyStateHandler
-            case self.PREPARING_DATA_OBJECT:   return PreparingDataObjectStateHandler
-            case self.SELECT_OBJECT:           return SelectObjectStateHandler
-            case self.CREATE_OBJECT:           return CreateObjectStateHandler
-            case self.TRANSFERRING_OBJECT:     return TransferringObjectStateHandler
-            case self.VALIDATE_OBJECT:         return ValidateObjectStateHandler
-            case self.EXECUTE_OBJECT:          return ExecuteObjectStateHandler
-            case self.TRANSFER_DONE:           return TransferDoneStateHandler
-
-    async def entry(self, context):
-        return await self.handler.entry(context)
+    def handler(self) -> type[TxStateHandler]:
+        return _STATE_HANDLERS[self]
 
-    async def handle(self, context):
-        return await self.handler.handle(context)
-
-    def exit(self, context):
-        return self.handler.exit(context)
+    async def run(self, context):
+        return await self.handler.run(context)
 
 
 class SecureDFUContext:
@@ -128,16 +206,21 @@ class SecureDFUContext:
         "target",       # BLEDevice     target to update
         "pkg",          # DFUPackage    dfu update package
         "log",          # Logger        logger
-        "timeout",      # int           default ble connection timeout
+        "timeout",      # float         seconds to wait for a response, None to wait forever
         "img_queue",    # list[str]     list of images to send
         "client",       # BleakClient   bleak client object
-        "responses",    # Queue         client notification queue
+        "responses",    # deque         client notifications not yet handled
+        "resp_ready",   # Event         set when a notification is queued
         "img",          # DFUImage      current image being transferred
-        "txdata",       # bytearray     remaining image data to be tranferred
+        "txdata",       # memoryview    init packet or image data being transferred
+        "tx_offset",    # int           offset of the current object in txdata
+        "full_crc",     # int           crc of the full init packet or image being transferred
         "obj_type",     # ProcedureType current object type
-        "object",       # bytearray     remaining object data to be transferred
+        "object",       # memoryview    current object data being transferred
         "pkt",          # bytearray     current raw data packet being transferred
-        "prn",          # int           current packet receipt notification number
+        "pkt_size",     # int           maximum data packet size in bytes
+        "prn",          # int           current packet receipt notification number, None if unknown
+        "prn_window",   # int           packets sent between PRNs during a transfer, 0 for none
         "local_crc",    # int           current object crc on controller
         "bytes_sent",   # int           txdata bytes sent
         "objects_sent", # int           number of current data objects successfully sent
@@ -152,7 +235,8 @@ class SecureDFUContext:
         name: str,
         pkg: DFUPackage,
         log: Logger = None,
-        timeout: int = None,
+        timeout: float = 10.0,
+        prn_window: int = 0,
     ):
         self.state      = SecureTxState.DISCONNECTED
         self.prev_state = None
@@ -168,14 +252,19 @@ class SecureDFUContext:
         ]
         
         self.client         = None
-        self.responses      = Queue()
+        self.responses      = deque()
+        self.resp_ready     = Event()
 
         self.img            = None
         self.txdata         = None
+        self.tx_offset      = 0
+        self.full_crc       = 0
         self.obj_type       = ProcedureType.INVALID
         self.object         = None
         self.pkt            = None
+        self.pkt_size       = 20
         self.prn            = 0
+        self.prn_window     = prn_window
         self.local_crc      = 0
         self.bytes_sent     = 0
         self.objects_sent   = 0
@@ -186,6 +275,12 @@ class SecureDFUContext:
         self.target_crc     = 0
 
 
+    def release_views(self):
+        """drop the views into the init packet and image being transferred"""
+        self.txdata = None
+        self.object = None
+        self.pkt = None
+
     def transition(self, new_state: SecureTxState) -> TxStatus:
         """helper to transition states"""
         self.prev_state = self.state
@@ -193,24 +288,42 @@ class SecureDFUContext:
         return TxStatus.TRANSITIONED
 
 
+    async def next_notification(self) -> Notification | None:
+        """wait for the next notification from the client
+        return None if none arrived within the timeout
+        """
+        if not self.responses:
+            # notifications are delivered on the event loop, so nothing can
+            # be queued between checking and clearing the event
+            self.resp_ready.clear()
+            try:
+                await asyncio.wait_for(self.resp_ready.wait(), self.timeout)
+            except TimeoutError:
+                return None
+        return self.responses.popleft()
+
     def get_response_nowait(self) -> Response | None:
         """get the last response from the client if there was one
         return None if there were no responses
         """
         try:
-            notification = self.responses.get_nowait()
-        except QueueEmpty as e:
+            notification = self.responses.popleft()
+        except IndexError:
             return None
         
         response = Response(notification.data)
-        self.log.info(f"{notification.sender.description} {notification.time}: {response.description}")
+        self.log.info("%s %s: %s", notification.sender.description, notification.time, response)
         return response
 
-    async def get_response(self) -> Response:
-        """get the last response from the client"""
-        notification = await self.responses.get()
+    async def get_response(self) -> Response | None:
+        """wait for the next response from the client
+        return None if none arrived within the timeout
+        """
+        notification = await self.next_notification()
+        if notification is None:
+            return None
         response = Response(notification.data)
-        self.log.info(f"{notification.sender.description} {notification.time}: {response.description}")
+        self.log.info("%s %s: %s", notification.sender.description, notification.time, response)
         return response
 
     def get_prn_nowait(self) -> Response | None:
@@ -218,21 +331,31 @@ class SecureDFUContext:
         return None if there were no responses
         """
         try:
-            notification = self.responses.get_nowait()
-        except QueueEmpty as e:
+            notification = self.responses.popleft()
+        except IndexError:
             return None
 
         prn_response = PRN(notification.data)
         assert prn_response.req_opcode == Opcode.CRC_GET
-        self.log.debug(f"{notification.sender.description} {notification.time}: {prn_response.description}")
+        # the sender's description is looked up even for a lazy record,
+        # so skip it entirely when debug output is off
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug("%s %s: %s", notification.sender.description, notification.time, prn_response)
         return prn_response
 
-    async def get_prn(self) -> Response:
-        """get the last response from client as a PRN"""
-        notification = await self.responses.get()
+    async def get_prn(self) -> Response | None:
+        """wait for the next response from client as a PRN
+        return None if none arrived within the timeout
+        """
+        notification = await self.next_notification()
+        if notification is None:
+            return None
         prn_response = PRN(notification.data)
         assert prn_response.req_opcode == Opcode.CRC_GET
-        self.log.debug(f"{notification.sender.description} {notification.time}: {prn_response.description}")
+        # the sender's description is looked up even for a lazy record,
+        # so skip it entirely when debug output is off
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug("%s %s: %s", notification.sender.description, notification.time, prn_response)
         return prn_response
 
 
@@ -244,7 +367,7 @@ class SecureDFUContext:
         """
         self.prn = value
         await self.client.write_ctl(
-            Request(Opcode.RECEIPT_NOTIF_SET, prn_value=value))
+            Request.set_prn(value))
 
         return await self.get_response()
 
@@ -262,26 +385,26 @@ class SecureDFUContext:
         """send OBJECT SELECT request"""
         assert self.prn == 0
         return await self.client.write_ctl(
-            Request(Opcode.OBJECT_SELECT, object_type=object_type))
+            Request.select(object_type))
 
     async def object_create(self, object_type, object_size):
         """send OBJECT CREATE request"""
         assert self.prn == 0
         return await self.client.write_ctl(
-            Request(Opcode.OBJECT_CREATE, object_type=object_type, object_size=object_size))
+            Request.create(object_type, object_size))
 
     async def object_execute(self):
         """send OBJECT EXECUTE request"""
         assert self.prn == 0
-        return await self.client.write_ctl(Request(Opcode.OBJECT_EXECUTE))
+        return await self.client.write_ctl(Request.execute())
 
     async def abort(self):
         """send ABORT request"""
-        return await self.client.write_ctl(Request(Opcode.ABORT))
+        return await self.client.write_ctl(Request.abort())
 
     async def crc_get(self):
         """send CRC_GET request"""
-        return await self.client.write_ctl(Request(Opcode.CRC_GET))
+        return await self.client.write_ctl(Request.crc_get())
 
 class SecureDFUManager(BaseDFUManager):
     """
@@ -289,8 +412,8 @@ class SecureDFUManager(BaseDFUManager):
 
     not truly event-driven, but can probably adapted to be
     """
-    def __init__(self, name: str, pkg: DFUPackage, log: Logger = None, timeout: int=None):
-        self.context = SecureDFUContext(name, pkg, log, timeout)
+    def __init__(self, name: str, pkg: DFUPackage, log: Logger = None, timeout: float=10.0, prn_window: int=0):
+        self.context = SecureDFUContext(name, pkg, log, timeout, check_prn_window(prn_window))
 
         assert len(pkg.images), "pkg must contain at least 1 image"
         assert not (
@@ -305,25 +428,20 @@ class SecureDFUManager(BaseDFUManager):
 
         # would normally get next event from event queue here, but the async model
         # doesn't really have events...
-        # instead we'll just loop on the last called handler status.
+        # instead each state runs until it transitions, and we move on to the next.
 
         try:
             while status != TxStatus.COMPLETE:
-                match status:
-                    case TxStatus.ERROR:
-                        assert_never("error handling not implemented")
-                    case (TxStatus.INIT
-                        | TxStatus.HANDLED
-                        | TxStatus.IGNORED
-                    ):
-                        status = await self.context.state.handle(self.context)
-                    case TxStatus.TRANSITIONED:
-                        check_status(self.context.prev_state.exit(self.context))
-                        status = await self.context.state.entry(self.context)
-                    case TxStatus.COMPLETE:
-                        assert_never("unreachable")
+                status = await self.context.state.run(self.context)
+                if status == TxStatus.ERROR:
+                    assert_never("error handling not implemented")
         finally:
-            await self.context.client.disconnect()
+            # there's no client if the target was never found
+            if self.context.client:
+                await self.context.client.disconnect()
+            # the images can only be unmapped once nothing views them
+            self.context.release_views()
+            self.context.pkg.close()
 
 
 ############################################################
@@ -332,13 +450,11 @@ class SecureDFUManager(BaseDFUManager):
 
 
 class DisconnectedStateHandler(TxStateHandler):
-    MAX_ATTEMPTS = 10
-    search_attempts = 0
+    SEARCH_TIMEOUT = 100.0
 
     @classmethod
     async def entry(cls, context) -> TxStatus:
         context.log.info("entering state: DISCONNECTED")
-        cls.search_attempts = 0
         return TxStatus.HANDLED
 
     @classmethod
@@ -349,22 +465,31 @@ class DisconnectedStateHandler(TxStateHandler):
             context.log.info("all images sent!")
             return context.transition(SecureTxState.TRANSFER_DONE)
 
-        # find_device_by_name seems to not always work...
-        cls.search_attempts += 1
-        context.log.info(f"searching for target (attempt {cls.search_attempts}): {context.name}")
-        context.target = await BleakScanner.find_device_by_name(context.name)
-        # devices = await BleakScanner.discover()
-        # for device in devices:
-        #     if device.name == context.name:
-        #         context.target = device
-        #         break
-
-        if not context.target:
-            if cls.search_attempts < cls.MAX_ATTEMPTS:
-                return TxStatus.HANDLED
-            else:
-                raise DFUErrorCode.FAILED_TO_CONNECT.as_err()
-        
+        # find_device_by_name seems to not always work, and retrying it
+        # starts and stops a whole scan each time. instead keep one scanner
+        # running and watch its advertisements for the target's name
+        found = Event()
+
+        def detection_callback(device: BLEDevice, adv):
+            if not found.is_set() and context.name in (adv.local_name, device.name):
+                context.target = device
+                found.set()
+
+        # read in and crc the images still to be sent before searching, off
+        # the loop. the crcs are cached on the images for when they're
+        # prepared, and nothing is left reading them if the search fails
+        images = [context.pkg.images[img_type] for img_type in context.img_queue]
+        await asyncio.to_thread(lambda: [img.img_crc for img in images])
+
+        context.target = None
+        context.log.info(f"searching for target: {context.name}")
+        async with BleakScanner(detection_callback=detection_callback):
+            try:
+                await asyncio.wait_for(found.wait(), cls.SEARCH_TIMEOUT)
+            except TimeoutError:
+                raise DFUErrorCode.FAILED_TO_CONNECT.as_err(
+                    f"{context.name} not found after {cls.SEARCH_TIMEOUT:g}s") from None
+
         context.log.info(f"{context.name} found!")
         return context.transition(SecureTxState.CONNECTING)
 
@@ -374,6 +499,10 @@ class ConnectingStateHandler(TxStateHandler):
     async def entry(cls, context) -> TxStatus:
         """on entry, attempt to connect to the target device"""
         context.log.info("entering state: CONNECTING")
+        if context.client is not None:
+            # the target usually resets after an image and drops the link,
+            # but the old client still holds its packet socket
+            await context.client.disconnect()
         context.client = SecureDFUClient(context.target.address)
         await context.client.connect()
         return TxStatus.HANDLED
@@ -384,16 +513,31 @@ class ConnectingStateHandler(TxStateHandler):
         
         on successful connection, start notifications and continue to img transfer 
         """
-        async def response_callback(sender: BleakGATTCharacteristic, data: bytearray):
+        def response_callback(sender: BleakGATTCharacteristic, data: bytearray):
             """a helper function to forward notifications to the manager context"""
             t = time.time()
-            await context.responses.put(
+            context.responses.append(
                 Notification(sender=sender, time=t, data=data))
+            context.resp_ready.set()
 
 
         if context.client.is_connected:
             context.log.info(f"connected to target {context.name}! beginning notifications...")
-            await context.client.start_notify(DFU_CTRL_POINT_UUID, response_callback)
+            context.client.resolve_chars()
+            try:
+                if await context.client.acquire_pkt_socket():
+                    context.log.info("writing packets through an acquired socket")
+            except Exception as e:
+                # the socket only saves time, bleak can still write the packets
+                context.log.warning(f"couldn't acquire a packet socket, writing packets through bleak: {e!r}")
+            # the target's prn isn't known for a new connection, so the
+            # first select will always clear it
+            context.prn = None
+            await context.client.start_notify(context.client.ctl_char, response_callback)
+
+            # send data in packets as large as the negotiated mtu allows
+            context.pkt_size = context.client.max_pkt_size()
+            context.log.info(f"using {context.pkt_size} byte packets")
             return context.transition(SecureTxState.TRANSFER_READY)
         else:
             return context.transition(SecureTxState.DISCONNECTED)
@@ -417,7 +561,9 @@ class TransferReadyStateHandler(TxStateHandler):
         context.local_crc = 0
         context.img = context.pkg.images[img_type]
         context.obj_type = ProcedureType.COMMAND
-        context.txdata = bytearray(context.img.init_data)
+        context.txdata = memoryview(context.img.init_data)
+        context.tx_offset = 0
+        context.full_crc = context.img.init_crc
         context.objects_sent = 0
         context.num_objects = 0
         context.attempts = 0
@@ -435,12 +581,15 @@ class PreparingDataObjectStateHandler(TxStateHandler):
     async def handle(cls, context):
         """prepare the next data object from txdata to send"""
 
-        context.log.info(f"preparing to send {context.img.img_type} ({len(context.txdata)} bytes) data objects...")
+        context.log.info(f"preparing to send {context.img.img_type} ({len(context.img.img_data)} bytes) data objects...")
 
         context.bytes_sent = 0
         context.local_crc = 0
         context.obj_type = ProcedureType.DATA
-        context.txdata = bytearray(context.img.img_data)
+        context.txdata = context.img.img_view
+        context.tx_offset = 0
+        # already worked out in a thread before searching for the target
+        context.full_crc = context.img.img_crc
         context.objects_sent = 0
         context.num_objects = 0
         context.attempts = 0
@@ -451,9 +600,9 @@ class PreparingDataObjectStateHandler(TxStateHandler):
 class SelectObjectStateHandler(TxStateHandler):
     @classmethod
     async def entry(cls, context) -> TxStatus:
-        # always set prn to 0
+        # make sure prn is 0, which is only unknown right after connecting
         context.log.info("entering state: SELECT_OBJECT")
-        await context.clear_prn_value(force=True)
+        await context.clear_prn_value()
 
         context.log.info("sending OBJECT_SELECT request...")
         await context.object_select(context.obj_type)
@@ -479,21 +628,40 @@ class SelectObjectStateHandler(TxStateHandler):
                 context.num_objects = (len(context.img.img_data) + context.max_size - 1) // context.max_size
 
         if (context.offset == len(context.txdata)
-            and context.target_crc == crc32(context.txdata)
+            and context.target_crc == context.full_crc
         ):
             # if the init packet has already been successfully sent, 
             # skip to execute
             context.object = context.txdata[:context.max_size]
+            context.objects_sent = context.num_objects
             
             context.log.info("init packet has already been successfully sent. skipping to EXECUTE_OBJECT...")
             return context.transition(SecureTxState.EXECUTE_OBJECT)
 
         elif (context.offset != 0
-            and context.offset <= len(context.txdata)
-            and context.target_crc == crc32(context.txdata[context.offset])
+            and context.offset < len(context.txdata)
+            and context.target_crc == crc32(context.txdata[:context.offset])
         ):
             # if init packet partially sent without error, resume sending data
-            context.object = context.object[context.offset:]
+            # from the target's offset, finishing the object it was receiving
+            context.bytes_sent = context.offset
+            context.local_crc = context.target_crc
+            context.objects_sent = context.offset // context.max_size
+            obj_offset = context.offset % context.max_size
+
+            if not obj_offset:
+                # the last object may have been received in full but not
+                # executed, and creating another would discard it. execute
+                # it (again, if it already was) and carry on from there
+                context.tx_offset = context.offset - context.max_size
+                context.object = context.txdata[context.tx_offset:context.offset]
+                context.log.info("transfer stopped between objects. executing last object...")
+                return context.transition(SecureTxState.EXECUTE_OBJECT)
+
+            # the object still starts where the target's does, and the transfer
+            # picks up from bytes_sent within it
+            context.tx_offset = context.offset - obj_offset
+            context.object = context.txdata[context.tx_offset:context.tx_offset + context.max_size]
 
             context.log.info("init packet transfer incomplete. resuming transfer...")
             return context.transition(SecureTxState.TRANSFERRING_OBJECT)
@@ -510,8 +678,8 @@ class CreateObjectStateHandler(TxStateHandler):
         # reset prn to 0 if necessary
         await context.clear_prn_value()
 
-        # copy the object from front of txdata
-        context.object = context.txdata[:context.max_size]
+        # take the object from the current offset in txdata
+        context.object = context.txdata[context.tx_offset:context.tx_offset + context.max_size]
 
         context.log.info(f"creating {context.obj_type.name} object {context.objects_sent + 1} ({len(context.object):#x} bytes) ...")
         context.log.info("sending OBJECT_CREATE request...")
@@ -529,87 +697,132 @@ class CreateObjectStateHandler(TxStateHandler):
         return context.transition(SecureTxState.TRANSFERRING_OBJECT)
 
 class TransferringObjectStateHandler(TxStateHandler):
-    DEFAULT_PRN = 10
-    GATT_PKT_SIZE = 20
-
     # state-specific class variables
     total_pkts = None
     pkts_sent = None
-    object_data = None
-    pkts_checked = None
+    data_offset = None
+    windows = None
 
     @classmethod
     async def entry(cls, context) -> TxStatus:
         """before transfer, set PRN value and reset class variables"""
         context.log.info("entering state: TRANSFERRING_OBJECT")
 
-        # set prn to default
-        context.log.info(f"setting PRN = {cls.DEFAULT_PRN}")
-        res = await context.set_prn_value(cls.DEFAULT_PRN)
-        check_response(res)
+        # set prn to the configured window. with no window the target only
+        # reports on the object once it's all sent, when it's validated
+        if context.prn_window:
+            context.log.info(f"setting PRN = {context.prn_window}")
+            res = await context.set_prn_value(context.prn_window)
+            check_response(res)
 
+        # a resumed object is partly on the target already, so only the rest
+        # of it is sent
+        cls.data_offset = context.bytes_sent - context.tx_offset
         # calculate total packets in the object being sent
-        cls.total_pkts = (len(context.object) + cls.GATT_PKT_SIZE - 1) // cls.GATT_PKT_SIZE
+        cls.total_pkts = (len(context.object) - cls.data_offset + context.pkt_size - 1) // context.pkt_size
         cls.pkts_sent = 0
-        cls.object_data = bytearray(context.object)
-        cls.pkts_checked = 0
+        cls.windows = cls.plan_windows(len(context.object), context.pkt_size, context.prn_window, cls.data_offset)
 
         return TxStatus.HANDLED
 
+    @classmethod
+    def plan_windows(cls, size: int, pkt_size: int, prn: int, start: int = 0) -> deque[tuple[int, bool, int | None]]:
+        """split an object into the windows of packets sent between PRNs
+
+        the schedule only depends on the object and packet sizes, so it's
+        worked out once per object as (end offset, whether a PRN follows,
+        PRN to set afterwards) for each window. full windows of the given
+        PRN come first, and if packets are left over the PRN is lowered so
+        the last, short window is checked too. a PRN of 0 sends the whole
+        object as a single window. packets are sent from start, which is
+        only past 0 when resuming an object
+        """
+        if not prn:
+            return deque(((size, False, None),))
+        full, rem = divmod((size - start + pkt_size - 1) // pkt_size, prn)
+        window_size = prn * pkt_size
+        windows = deque(
+            (min(start + (i + 1) * window_size, size), True, None) for i in range(full))
+        if not rem:
+            return windows
+        if not windows:
+            # the whole object fits before the first PRN
+            windows.append((size, False, None))
+            return windows
+        end, _, _ = windows.pop()
+        windows.append((end, True, rem))
+        windows.append((size, True, None))
+        return windows
+
     @classmethod
     async def handle(cls, context) -> TxStatus:
-        """send the next object packet"""
+        """send the object packets up to the next PRN"""
 
-        if cls.pkts_sent >= cls.total_pkts:
+        if not cls.windows:
             # finished sending all packets, go to validation
             context.log.info(f"object {context.objects_sent + 1} / {context.num_objects} transferred. proceeding to validate object...")
             context.objects_sent += 1
             return context.transition(SecureTxState.VALIDATE_OBJECT)
 
-        # prepare the next packet
-        context.pkt = cls.object_data[:cls.GATT_PKT_SIZE]
-        cls.object_data = cls.object_data[cls.GATT_PKT_SIZE:]
-        context.local_crc = crc32(context.pkt, context.local_crc)
-        
-        # send the next packet
-        context.log.debug(f"sending pkt ({cls.pkts_sent + 1} / {cls.total_pkts}): [ {hexlify(context.pkt, ' ')} ]")
-        await context.client.write_pkt(context.pkt)
-        cls.pkts_sent += 1
-        context.bytes_sent += len(context.pkt)
-
-        if (cls.pkts_sent - cls.pkts_checked) % context.prn:
-            # no PRN expected, send another packet
+        # send the packets up to the next PRN (or the end of the object) back
+        # to back, rather than going around the state machine for each one.
+        # they're awaited in turn, since the target needs them in order
+        window_end, expect_prn, next_prn = cls.windows.popleft()
+        window_start = cls.data_offset
+        pkt_size = context.pkt_size
+        object_data = context.object
+        write_pkt = context.client.write_pkt
+        # packet dumps are only formatted when debug output is on
+        debug = context.log.isEnabledFor(logging.DEBUG)
+        for start in range(window_start, window_end, pkt_size):
+            # the packets are views into the object, and the counters are
+            # only brought up to date once the window has been sent
+            context.pkt = object_data[start:start + pkt_size]
+            if debug:
+                context.log.debug("sending pkt (%d / %d): [ %s ]",
+                    cls.pkts_sent + (start - window_start) // pkt_size + 1, cls.total_pkts, hexlify(context.pkt, ' '))
+            await write_pkt(context.pkt)
+
+        cls.pkts_sent += (window_end - window_start + pkt_size - 1) // pkt_size
+        cls.data_offset = window_end
+        context.bytes_sent += window_end - window_start
+
+        # crc the whole window in one call, rather than packet by packet
+        context.local_crc = crc32(object_data[window_start:window_end], context.local_crc)
+
+        if not expect_prn:
+            # no PRN expected, the object has been sent
             return TxStatus.HANDLED
-        else:
-            # expecting a notification
-            res = await context.get_prn()
-            check_response(res)
 
-            context.log.debug(f"PRN: {res.description}")
+        # expecting a notification
+        res = await context.get_prn()
+        check_response(res)
 
-            context.offset = res.offset
-            context.target_crc = res.crc
+        context.log.debug("PRN: %s", res)
 
-            # validate data so far
-            if context.offset != context.bytes_sent:
-                context.log.error(f"offset mismatch! expected: {context.bytes_sent:#x}, got: {context.offset:#x}")
-                raise DFUErrorCode.BYTES_LOST.as_err()
-            elif context.target_crc != context.local_crc:
-                context.log.error(f"crc mismatch! expected: {context.local_crc:#x}, got: {context.target_crc:#x}")
-                # raise DFUErrorCode.CRC_ERROR.as_err()
-                return context.transition(SecureTxState.VALIDATE_OBJECT)
+        context.offset = res.offset
+        context.target_crc = res.crc
 
-            cls.pkts_checked = cls.pkts_sent
+        # validate data so far
+        if context.offset != context.bytes_sent:
+            context.log.error(f"offset mismatch! expected: {context.bytes_sent:#x}, got: {context.offset:#x}")
+            raise DFUErrorCode.BYTES_LOST.as_err()
+        elif context.target_crc != context.local_crc:
+            context.log.error(f"crc mismatch! expected: {context.local_crc:#x}, got: {context.target_crc:#x}")
+            # the rest of the object would be wasted airtime, so stop sending
+            # it and let validation retry the object. it's counted the same
+            # as one sent in full, since validation rolls the count back
+            context.objects_sent += 1
+            return context.transition(SecureTxState.VALIDATE_OBJECT)
 
-            remaining_pkts = cls.total_pkts - cls.pkts_sent
-            if remaining_pkts and remaining_pkts < context.prn:
-                # if fewer packets left to send than the prn, 
-                # update it now
-                context.log.info(f"setting PRN = {remaining_pkts}")
-                res = await context.set_prn_value(remaining_pkts)
-                check_response(res)
+        if next_prn:
+            # if fewer packets left to send than the prn, 
+            # update it now
+            context.log.info(f"setting PRN = {next_prn}")
+            res = await context.set_prn_value(next_prn)
+            check_response(res)
 
-            return TxStatus.HANDLED
+        return TxStatus.HANDLED
 
     @classmethod
     def exit(cls, context):
@@ -631,17 +844,28 @@ class ValidateObjectStateHandler(TxStateHandler):
     async def handle(cls, context):
         """validate CRC_GET response"""
         res = await context.get_response()
-        assert res.req_opcode == Opcode.CRC_GET
         check_response(res)
+        assert res.req_opcode == Opcode.CRC_GET
 
         context.log.info("CRC_GET response received!")
+        context.offset = res.offset
         context.target_crc = res.crc
 
-        if context.target_crc != context.local_crc:
+        # an object abandoned after a bad PRN is only partly on the target,
+        # and mustn't be executed even if its crc happens to match
+        if (context.target_crc != context.local_crc
+            or context.offset != context.tx_offset + len(context.object)
+        ):
             if context.attempts >= 3:
                 raise DFUErrorCode.CRC_ERROR.as_err()
             context.log.info(f"object CRC mismatch! trying again... (attempts: {context.attempts})")
-            objects_sent -= 1
+            # creating the object again resets the target to the start of it,
+            # so roll the transfer back to that boundary as well
+            boundary = context.tx_offset - context.tx_offset % context.max_size
+            context.tx_offset = boundary
+            context.bytes_sent = boundary
+            context.local_crc = crc32(context.txdata[:boundary])
+            context.objects_sent = boundary // context.max_size
             return context.transition(SecureTxState.CREATE_OBJECT)
 
         context.log.info("object CRC matched, proceeding to execute object...")
@@ -660,10 +884,12 @@ class ExecuteObjectStateHandler(TxStateHandler):
     async def handle(cls, context):
         """handle EXECUTE response"""
         res = await context.get_response()
-        assert res.req_opcode == Opcode.OBJECT_EXECUTE
         check_response(res)
+        assert res.req_opcode == Opcode.OBJECT_EXECUTE
 
         context.log.info("OBJECT_EXECUTE response received!")
+        # attempts are counted per object
+        context.attempts = 0
 
         if context.obj_type == ProcedureType.COMMAND:
             # init command should be transferred, continue to send image data
@@ -672,7 +898,7 @@ class ExecuteObjectStateHandler(TxStateHandler):
 
         elif context.objects_sent < context.num_objects:
             # image transfer incomplete, send next data object
-            context.txdata = context.txdata[len(context.object):]
+            context.tx_offset += len(context.object)
 
             context.log.info("sending next data object...")
             return context.transition(SecureTxState.CREATE_OBJECT)
@@ -699,3 +925,17 @@ class TransferDoneStateHandler(TxStateHandler):
         context.log.info("update complete!")
         return TxStatus.COMPLETE
 
+
+# handler classes by state, looked up by SecureTxState.handler
+_STATE_HANDLERS: dict[SecureTxState, type[TxStateHandler]] = {
+    SecureTxState.DISCONNECTED:            DisconnectedStateHandler,
+    SecureTxState.CONNECTING:              ConnectingStateHandler,
+    SecureTxState.TRANSFER_READY:          TransferReadyStateHandler,
+    SecureTxState.PREPARING_DATA_OBJECT:   PreparingDataObjectStateHandler,
+    SecureTxState.SELECT_OBJECT:           SelectObjectStateHandler,
+    SecureTxState.CREATE_OBJECT:           CreateObjectStateHandler,
+    SecureTxState.TRANSFERRING_OBJECT:     TransferringObjectStateHandler,
+    SecureTxState.VALIDATE_OBJECT:         ValidateObjectStateHandler,
+    SecureTxState.EXECUTE_OBJECT:          ExecuteObjectStateHandler,
+    SecureTxState.TRANSFER_DONE:           TransferDoneStateHandler,
+}
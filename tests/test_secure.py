@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import os
+import socket
+import unittest
+from types import SimpleNamespace
+from zlib import crc32
+
+from nrf52_ble_dfu.error import DFUError, DFUErrorCode
+from nrf52_ble_dfu.models.secure import (
+    SecureDFUExtendedErrorCode,
+    SecureDFUPacketReceiptNotification,
+    SecureDFUResponse,
+)
+from nrf52_ble_dfu.protocol import Notification
+from nrf52_ble_dfu.protocol.secure import (
+    MessageType,
+    SecureDFUClient,
+    SecureDFUContext,
+    SecureTxState,
+    TransferringObjectStateHandler,
+)
+
+# object sizes the target reports for command and data objects
+MAX_SIZE = {1: 0x100, 2: 0x400}
+PKT_SIZE = 20
+
+# the expected crc mismatches are logged as errors
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class FakeTarget:
+    """a secure dfu bootloader that takes requests and packets from the context
+
+    it stands in for the context's client, and notifies the context directly.
+    packet writes numbered in corrupt have their first byte flipped
+    """
+    sender = SimpleNamespace(description="ctl")
+
+    def __init__(self, context, corrupt=()):
+        self.context = context
+        self.corrupt = set(corrupt)
+        self.executed = {1: bytearray(), 2: bytearray()}
+        self.current = {1: bytearray(), 2: bytearray()}
+        self.obj_type = 1
+        self.prn = 0
+        self.since_prn = 0
+        self.writes = 0
+        self.creates = 0
+
+    def received(self) -> bytes:
+        return bytes(self.executed[self.obj_type] + self.current[self.obj_type])
+
+    def notify(self, data: bytes):
+        self.context.responses.append(Notification(sender=self.sender, time=0, data=bytearray(data)))
+        self.context.resp_ready.set()
+
+    def notify_crc(self, opcode: int):
+        data = self.received()
+        self.notify(bytes((0x60, opcode, 1))
+            + len(data).to_bytes(4, "little") + crc32(data).to_bytes(4, "little"))
+
+    async def write_pkt(self, pkt_data):
+        self.writes += 1
+        pkt_data = bytes(pkt_data)
+        if self.writes in self.corrupt:
+            pkt_data = bytes((pkt_data[0] ^ 0xFF,)) + pkt_data[1:]
+        self.current[self.obj_type] += pkt_data
+        self.since_prn += 1
+        if self.prn and self.since_prn == self.prn:
+            self.since_prn = 0
+            self.notify_crc(0x03)
+
+    async def write_ctl(self, request, response=True):
+        data = request.data
+        match data[0]:
+            case 0x01:
+                self.creates += 1
+                self.obj_type = data[1]
+                self.current[self.obj_type] = bytearray()
+                self.since_prn = 0
+                self.notify(b"\x60\x01\x01")
+            case 0x02:
+                self.prn = int.from_bytes(data[1:3], "little")
+                self.since_prn = 0
+                self.notify(b"\x60\x02\x01")
+            case 0x03:
+                self.notify_crc(0x03)
+            case 0x04:
+                self.executed[self.obj_type] += self.current[self.obj_type]
+                self.current[self.obj_type] = bytearray()
+                self.notify(b"\x60\x04\x01")
+            case 0x06:
+                self.obj_type = data[1]
+                received = self.received()
+                self.notify(b"\x60\x06\x01" + MAX_SIZE[self.obj_type].to_bytes(4, "little")
+                    + len(received).to_bytes(4, "little") + crc32(received).to_bytes(4, "little"))
+
+    async def disconnect(self):
+        pass
+
+
+def make_context(img_data: bytes, prn_window: int = 0) -> SecureDFUContext:
+    init_data = bytes(range(200))
+    img = SimpleNamespace(
+        img_type="application",
+        init_data=init_data,
+        init_crc=crc32(init_data),
+        img_data=img_data,
+        img_view=memoryview(img_data),
+        img_crc=crc32(img_data),
+    )
+    pkg = SimpleNamespace(images={"application": img}, close=lambda: None)
+    context = SecureDFUContext("DfuTarg", pkg, log, 1.0, prn_window)
+    context.pkt_size = PKT_SIZE
+    return context
+
+
+async def send_image(context: SecureDFUContext):
+    """run the state machine from a connection until the image is sent"""
+    context.state = SecureTxState.TRANSFER_READY
+    while context.state != SecureTxState.DISCONNECTED:
+        await context.state.run(context)
+
+
+class PlanWindowsTest(unittest.TestCase):
+    def plan(self, size: int, prn: int, start: int = 0) -> list:
+        return list(TransferringObjectStateHandler.plan_windows(size, PKT_SIZE, prn, start))
+
+    def test_no_prn(self):
+        self.assertEqual(self.plan(0x400, 0), [(0x400, False, None)])
+
+    def test_smaller_than_window(self):
+        # 3 packets never reach a PRN of 4
+        self.assertEqual(self.plan(55, 4), [(55, False, None)])
+
+    def test_exact_multiple(self):
+        self.assertEqual(self.plan(160, 4), [(80, True, None), (160, True, None)])
+        # a short last packet still completes the window
+        self.assertEqual(self.plan(150, 4), [(80, True, None), (150, True, None)])
+
+    def test_short_tail(self):
+        # 9 packets: two windows of 4, then the PRN is lowered for the last one
+        self.assertEqual(self.plan(175, 4), [(80, True, None), (160, True, 1), (175, True, None)])
+
+    def test_resumed(self):
+        # 7 packets are left after the first 35 bytes
+        self.assertEqual(self.plan(175, 4, 35), [(115, True, 3), (175, True, None)])
+        self.assertEqual(self.plan(175, 0, 35), [(175, False, None)])
+
+
+class TransferTest(unittest.TestCase):
+    def setUp(self):
+        self.img_data = bytes(i * 7 & 0xFF for i in range(0x1234))
+
+    def send(self, prn_window: int = 0, corrupt=()) -> FakeTarget:
+        context = make_context(self.img_data, prn_window)
+        target = FakeTarget(context, corrupt)
+        context.client = target
+        asyncio.run(send_image(context))
+        return target
+
+    def test_send(self):
+        for prn_window in (0, 1, 4, 100):
+            with self.subTest(prn_window=prn_window):
+                target = self.send(prn_window)
+                self.assertEqual(bytes(target.executed[1]), bytes(range(200)))
+                self.assertEqual(bytes(target.executed[2]), self.img_data)
+                self.assertEqual(target.creates, 1 + 5)
+
+    def test_retry(self):
+        # corrupt a packet in the second data object, which the init packet's
+        # 10 packets and the first object's 52 come before
+        for prn_window in (0, 4):
+            with self.subTest(prn_window=prn_window):
+                target = self.send(prn_window, corrupt=(10 + 52 + 3,))
+                self.assertEqual(bytes(target.executed[2]), self.img_data)
+                self.assertEqual(target.creates, 1 + 5 + 1)
+
+    def test_retries_exhausted(self):
+        # the first data object is corrupted on every attempt
+        with self.assertRaises(DFUError) as cm:
+            self.send(corrupt=(10 + 1, 10 + 52 + 1, 10 + 2 * 52 + 1))
+        self.assertEqual(cm.exception.code, DFUErrorCode.CRC_ERROR.code)
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.img_data = bytes(i * 7 & 0xFF for i in range(0x1234))
+
+    def resume(self, offset: int, prn_window: int = 0, corrupt=(), executed: int = None) -> FakeTarget:
+        """send the image to a target that already holds it up to offset
+
+        the target has executed the objects up to executed, which defaults to
+        the start of the object offset is in
+        """
+        context = make_context(self.img_data, prn_window)
+        target = FakeTarget(context, corrupt)
+        start = offset - offset % MAX_SIZE[2] if executed is None else executed
+        target.executed[1] += context.pkg.images["application"].init_data
+        target.executed[2] += self.img_data[:start]
+        target.current[2] += self.img_data[start:offset]
+        context.client = target
+        asyncio.run(send_image(context))
+        return target
+
+    def test_resume_unaligned(self):
+        target = self.resume(0x0a37)
+        self.assertEqual(bytes(target.executed[2]), self.img_data)
+        # the resumed object is finished rather than created again
+        self.assertEqual(target.creates, 2)
+        self.assertEqual(target.writes, (0x0c00 - 0x0a37 + PKT_SIZE - 1) // PKT_SIZE + 52 + 29)
+
+    def test_resume_unexecuted(self):
+        # the target holds a whole object it hasn't executed
+        target = self.resume(0x0c00, executed=0x0800)
+        self.assertEqual(bytes(target.executed[2]), self.img_data)
+        self.assertEqual(target.creates, 2)
+
+    def test_resume_unaligned_crc_mismatch(self):
+        # the first packet after resuming is corrupted, so the object that
+        # was resumed part way through has to be sent again from its start
+        target = self.resume(0x0a37, corrupt=(1,))
+        self.assertEqual(bytes(target.executed[2]), self.img_data)
+        self.assertEqual(target.creates, 3)
+
+    def test_resume_unaligned_crc_mismatch_prn(self):
+        target = self.resume(0x0a37, prn_window=4, corrupt=(6,))
+        self.assertEqual(bytes(target.executed[2]), self.img_data)
+        self.assertEqual(target.creates, 3)
+
+
+class ResponseTest(unittest.TestCase):
+    def assertUnsupported(self, parse, data: bytes):
+        with self.assertRaises(DFUError) as cm:
+            parse(bytearray(data))
+        self.assertEqual(cm.exception.code, DFUErrorCode.UNSUPPORTED_RESPONSE.code)
+
+    def test_short_responses(self):
+        for data in (b"\x60\x06", b"\x60\x06\x01\x00\x10", b"\x60\x03\x01\x00", b"\x60\x03\x0b"):
+            self.assertUnsupported(SecureDFUResponse, data)
+        for data in (b"\x60\x03", b"\x60\x03\x01\x00", b"\x60\x03\x0b"):
+            self.assertUnsupported(SecureDFUPacketReceiptNotification, data)
+
+    def test_extended_errors(self):
+        res = SecureDFUResponse(bytearray(b"\x60\x01\x0b\x08"))
+        self.assertIs(res.error, SecureDFUExtendedErrorCode.SIGNATURE_MISSING)
+        self.assertIs(res.error.error(), DFUErrorCode.REMOTE_EXTENDED_ERROR_SIGNATURE_MISSING)
+        self.assertUnsupported(SecureDFUResponse, b"\x60\x01\x0b\x7f")
+        self.assertUnsupported(SecureDFUPacketReceiptNotification, b"\x60\x03\x0b\x7f")
+
+
+class FakeBus:
+    """answers every call with the given reply, or raises it"""
+    def __init__(self, reply):
+        self.reply = reply
+
+    async def call(self, message):
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return self.reply
+
+
+class AcquireSocketTest(unittest.TestCase):
+    def acquire(self, reply) -> SecureDFUClient:
+        client = SecureDFUClient("AA:BB:CC:DD:EE:FF")
+        client.pkt_char = SimpleNamespace(obj=("/org/bluez/hci0/dev_AA_BB_CC_DD_EE_FF/service0010/char0013", {}))
+        client._backend._bus = FakeBus(reply)
+        asyncio.run(client.acquire_pkt_socket())
+        return client
+
+    def assertClosed(self, fd: int):
+        with self.assertRaises(OSError):
+            os.fstat(fd)
+
+    def test_acquired(self):
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        with ours:
+            fd = theirs.detach()
+            client = self.acquire(SimpleNamespace(
+                message_type=MessageType.METHOD_RETURN, body=[0, 247], unix_fds=[fd]))
+            self.assertEqual(client.pkt_sock.fileno(), fd)
+            self.assertEqual(client.pkt_mtu, 247)
+            client.pkt_sock.close()
+            self.assertClosed(fd)
+
+    def test_call_failed(self):
+        with self.assertRaises(OSError):
+            self.acquire(OSError("bus went away"))
+
+    def test_bad_replies(self):
+        for message_type, body in (
+            (MessageType.ERROR, ["not permitted"]),
+            (MessageType.METHOD_RETURN, [0]),
+        ):
+            with self.subTest(message_type=message_type, body=body):
+                ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+                with ours:
+                    fd = theirs.detach()
+                    reply = SimpleNamespace(
+                        message_type=message_type, error_name="org.bluez.Error", body=body, unix_fds=[fd])
+                    with self.assertRaises(RuntimeError):
+                        self.acquire(reply)
+                    self.assertClosed(fd)
+
+
+if __name__ == "__main__":
+    unittest.main()